@@ -22,22 +22,33 @@ Environment (.env) example:
   MAX_BACKUP_MB=45                      # optional; max doc size to send (MB), else path is sent
 
 Requirements:
-  pip3 install --upgrade "python-telegram-bot[job-queue]>=20,<21" python-dateutil
+  pip3 install --upgrade "python-telegram-bot[job-queue]>=20,<21" python-dateutil uvloop "httpx[http2]"
 """
 
 from __future__ import annotations
 
+import asyncio
+import csv
+import importlib.util
+import logging
+import logging.handlers
 import os
+import queue
 import io
+import threading
 import zipfile
 import sqlite3
 import shutil
+import tempfile
+from contextlib import contextmanager
+from functools import partial
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import datetime, time as dtime, timedelta, timezone
 from pathlib import Path
 from typing import Optional, List
 from zoneinfo import ZoneInfo
 
+from apscheduler.triggers.interval import IntervalTrigger
 from dateutil import parser as dateparser
 from telegram import (
     Update,
@@ -45,6 +56,7 @@ from telegram import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
 )
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -55,6 +67,23 @@ from telegram.ext import (
     ContextTypes,
 )
 
+logger = logging.getLogger(__name__)
+
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """Route log records through a QueueHandler so the event-loop thread
+    only enqueues; a QueueListener thread does the formatting and I/O."""
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(q, stream)
+    listener.start()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(q))
+    # httpx logs every poll request at INFO; keep it quiet
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
 # -------------------- Emoji variables (Unicode) --------------------
 EMOJI_RENEW   = "\U0001F504"   # 🔄
 EMOJI_CLOSE   = "\u274C"       # ❌
@@ -70,6 +99,7 @@ EMOJI_RESTORE = "\u267B\uFE0F" # ♻️
 
 DB_PATH = os.environ.get("DB_PATH", "data.db")
 DEFAULT_TZ = os.environ.get("TZ", "Asia/Dubai")
+TZINFO = ZoneInfo(DEFAULT_TZ)  # constructed once; used on every timestamp we touch
 DEFAULT_DURATION_DAYS = 30
 
 # Backup config
@@ -86,18 +116,149 @@ AWAITING_ADMIN_ACTION_KEY = "awaiting_admin_action"  # "add" | "remove"
 
 # ===================== Time helpers =====================
 def now_tz() -> datetime:
-    return datetime.now(ZoneInfo(DEFAULT_TZ))
+    return datetime.now(TZINFO)
+
+def to_utc_iso(dt: datetime) -> str:
+    """Normalized UTC form stored in the DB ("...Z"): every row carries the
+    same offset, so lexicographic TEXT comparison equals chronological order
+    regardless of the configured display TZ."""
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 
 # ===================== Data layer =====================
-def db() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+# One long-lived connection for the whole process. Opening a fresh connection
+# per query costs file-open + journal setup on every Telegram update; keeping a
+# single WAL connection lets the SQLite page cache stay hot. The lock serializes
+# transactions across PTB's worker threads.
+_CONN: Optional[sqlite3.Connection] = None
+_CONN_LOCK = threading.RLock()
+_TXN = threading.local()  # per-thread transaction nesting depth
+
+
+def _open_conn() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=256
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA cache_size=-32000")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
     return conn
 
 
+def get_conn() -> sqlite3.Connection:
+    global _CONN
+    with _CONN_LOCK:
+        if _CONN is None:
+            _CONN = _open_conn()
+        return _CONN
+
+
+def close_conn():
+    """Close the shared connection (e.g. before replacing the DB file).
+
+    Takes the transaction lock, so it waits for in-flight db() blocks in
+    worker threads instead of closing the connection under them. Runs
+    PRAGMA optimize first so the planner's statistics get refreshed from
+    whatever this session learned about the data distribution.
+    """
+    global _CONN
+    with _CONN_LOCK:
+        if _CONN is not None:
+            try:
+                _CONN.execute("PRAGMA optimize")
+            except Exception:
+                pass
+            try:
+                _CONN.close()
+            except Exception:
+                pass
+            _CONN = None
+
+
+@contextmanager
+def db():
+    """Yield the shared connection inside a transaction (BEGIN IMMEDIATE/COMMIT).
+
+    Re-entrant: a helper that uses db() can be called from inside another
+    db() block on the same thread and joins the outer transaction instead of
+    deadlocking or double-BEGINning.
+    """
+    with _CONN_LOCK:
+        # resolved under the lock so a concurrent close_conn/reopen can't
+        # hand us a connection that is about to be closed
+        conn = get_conn()
+        outer_depth = getattr(_TXN, "depth", 0)
+        _TXN.depth = outer_depth + 1
+        try:
+            if outer_depth == 0:
+                conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                if outer_depth == 0:
+                    conn.execute("ROLLBACK")
+                raise
+            else:
+                if outer_depth == 0:
+                    conn.execute("COMMIT")
+        finally:
+            _TXN.depth = outer_depth
+
+
+# Hot-path SQL, hoisted so every call site hands SQLite the same statement
+# text and the connection statement cache hits instead of re-parsing.
+PRODUCT_COLS = "id, description, buyer_id, purchase_date, duration_days, expires_at, is_active"
+SQL_LIST_ACTIVE = (
+    f"SELECT {PRODUCT_COLS} FROM products "
+    "WHERE is_active=1 ORDER BY expires_at ASC LIMIT 50"
+)
+SQL_LIST_EXPIRED = (
+    f"SELECT {PRODUCT_COLS} FROM products "
+    "WHERE is_active=1 AND expires_at <= ? ORDER BY expires_at ASC LIMIT 200"
+)
+SQL_FIND = (
+    f"SELECT {PRODUCT_COLS} FROM products "
+    "WHERE description LIKE ? OR (buyer_id IS NOT NULL AND buyer_id LIKE ?) "
+    "ORDER BY expires_at ASC LIMIT 100"
+)
+_QUALIFIED_COLS = ", ".join(f"products.{c}" for c in PRODUCT_COLS.split(", "))
+SQL_FIND_FTS = (
+    f"SELECT {_QUALIFIED_COLS} FROM products "
+    "JOIN products_fts ON products_fts.rowid = products.id "
+    "WHERE products_fts MATCH ? ORDER BY rank LIMIT 100"
+)
+SQL_DAILY_SUMMARY = (
+    f"SELECT {PRODUCT_COLS}, "
+    "CASE WHEN expires_at <= ? THEN 0 ELSE 1 END AS bucket "
+    "FROM products WHERE is_active=1 AND expires_at <= ? "
+    "ORDER BY bucket, expires_at"
+)
+SQL_CLOSE = (
+    "UPDATE products SET is_active=0, updated_at=? "
+    "WHERE id=? AND is_active=1 RETURNING id"
+)
+SQL_CLOSE_MANY = (
+    "UPDATE products SET is_active=0, updated_at=? WHERE id=? AND is_active=1"
+)
+SQL_DAILY_PROBE = (
+    "SELECT EXISTS(SELECT 1 FROM products WHERE is_active=1 AND expires_at <= ?)"
+)
+
+
+# Bump whenever the DDL below changes; warm starts then skip straight past
+# the schema work on a single PRAGMA read.
+SCHEMA_VERSION = 4
+
+
 def init_db():
     with db() as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            seed_admins_from_env()
+            return
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS products (
@@ -106,7 +267,7 @@ def init_db():
                 buyer_id TEXT,
                 purchase_date TEXT NOT NULL, -- ISO date (YYYY-MM-DD)
                 duration_days INTEGER NOT NULL DEFAULT 30,
-                expires_at TEXT NOT NULL, -- ISO datetime with tzinfo
+                expires_at TEXT NOT NULL, -- UTC ISO datetime ("...Z")
                 is_active INTEGER NOT NULL DEFAULT 1,
                 created_at TEXT NOT NULL,
                 updated_at TEXT NOT NULL
@@ -130,17 +291,66 @@ def init_db():
             );
             """
         )
-        # defaults
-        cur = conn.execute("SELECT value FROM settings WHERE key='default_duration_days'")
-        if cur.fetchone() is None:
-            conn.execute(
-                "INSERT INTO settings(key, value) VALUES(?, ?)",
-                ("default_duration_days", str(DEFAULT_DURATION_DAYS)),
+        # indexes for the hot list/expired/find queries (expires_at is ISO-8601,
+        # so it sorts lexicographically and the index serves ORDER BY directly).
+        # The partial index only carries active rows — every hot query filters
+        # on is_active=1, and closed rows accumulate forever.
+        conn.execute("DROP INDEX IF EXISTS idx_products_active_expires")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_products_expires_active "
+            "ON products(expires_at) WHERE is_active=1"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_products_desc ON products(description)")
+        # full-text search over description/buyer_id, kept in sync by triggers;
+        # the rebuild backfills rows that predate the virtual table
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+            "description, buyer_id, content='products', content_rowid='id')"
+        )
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+            "INSERT INTO products_fts(rowid, description, buyer_id) "
+            "VALUES (new.id, new.description, new.buyer_id); END"
+        )
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+            "INSERT INTO products_fts(products_fts, rowid, description, buyer_id) "
+            "VALUES ('delete', old.id, old.description, old.buyer_id); END"
+        )
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE ON products BEGIN "
+            "INSERT INTO products_fts(products_fts, rowid, description, buyer_id) "
+            "VALUES ('delete', old.id, old.description, old.buyer_id); "
+            "INSERT INTO products_fts(rowid, description, buyer_id) "
+            "VALUES (new.id, new.description, new.buyer_id); END"
+        )
+        conn.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild')")
+        # normalize timestamps written before the UTC-Z convention: a mix of
+        # offsets would break the plain TEXT comparisons the hot queries use
+        stale = conn.execute(
+            "SELECT id, expires_at FROM products WHERE expires_at NOT LIKE '%Z'"
+        ).fetchall()
+        if stale:
+            conn.executemany(
+                "UPDATE products SET expires_at=? WHERE id=?",
+                [
+                    (to_utc_iso(datetime.fromisoformat(r["expires_at"])), r["id"])
+                    for r in stale
+                ],
             )
-        if conn.execute("SELECT value FROM settings WHERE key='backup_enabled'").fetchone() is None:
-            conn.execute("INSERT INTO settings(key, value) VALUES('backup_enabled','0')")
-        if conn.execute("SELECT value FROM settings WHERE key='backup_interval_hours'").fetchone() is None:
-            conn.execute("INSERT INTO settings(key, value) VALUES('backup_interval_hours','24')")
+        # defaults: one INSERT OR IGNORE sweep instead of a probe per key
+        conn.executemany(
+            "INSERT OR IGNORE INTO settings(key, value) VALUES(?, ?)",
+            [
+                ("default_duration_days", str(DEFAULT_DURATION_DAYS)),
+                ("backup_enabled", "0"),
+                ("backup_interval_hours", "24"),
+            ],
+        )
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    # mask 0x10002: analyze only tables the planner actually flagged, so a
+    # warm start never pays for a full ANALYZE
+    get_conn().execute("PRAGMA optimize=0x10002")
     seed_admins_from_env()
 
 
@@ -151,24 +361,53 @@ def seed_admins_from_env():
         return
     ids = []
     for x in raw.split(","):
-        x = x.strip()
-        if x.isdigit():
-            ids.append(int(x))
+        try:
+            ids.append(int(x.strip()))
+        except ValueError:
+            continue
     if not ids:
         return
     now = now_tz().isoformat()
     with db() as conn:
-        for cid in ids:
-            conn.execute(
-                "INSERT OR IGNORE INTO admins(chat_id, created_at) VALUES(?, ?)",
-                (cid, now),
-            )
+        conn.executemany(
+            "INSERT OR IGNORE INTO admins(chat_id, created_at) VALUES(?, ?)",
+            [(cid, now) for cid in ids],
+        )
+    invalidate_admin_cache()
+
+
+# In-process caches for read-mostly data. is_admin() runs on every update and
+# get_default_days() on every add/renew; neither should cost a DB round-trip.
+# The mutators below invalidate them.
+_ADMIN_IDS: Optional[List[int]] = None
+_ADMIN_SET: Optional[set] = None
+_DEFAULT_DAYS_CACHE: Optional[int] = None
+
+
+def invalidate_admin_cache():
+    global _ADMIN_IDS, _ADMIN_SET
+    _ADMIN_IDS = None
+    _ADMIN_SET = None
 
 
 def get_admin_ids() -> List[int]:
+    global _ADMIN_IDS, _ADMIN_SET
+    if _ADMIN_IDS is None:
+        with db() as conn:
+            rows = conn.execute("SELECT chat_id FROM admins ORDER BY id ASC").fetchall()
+        _ADMIN_IDS = [r["chat_id"] for r in rows]
+        _ADMIN_SET = set(_ADMIN_IDS)
+    return _ADMIN_IDS
+
+
+def is_admin_id(chat_id: int) -> bool:
+    """Point lookup against the UNIQUE chat_id index, without materializing the
+    whole admins list — the cache-free path (e.g. right after an invalidation)."""
     with db() as conn:
-        rows = conn.execute("SELECT chat_id FROM admins ORDER BY id ASC").fetchall()
-    return [r["chat_id"] for r in rows]
+        row = conn.execute(
+            "SELECT 1 FROM admins WHERE chat_id=? LIMIT 1", (chat_id,)
+        ).fetchone()
+    return row is not None
 
 
 def add_admin_id(chat_id: int) -> bool:
@@ -178,6 +417,7 @@ def add_admin_id(chat_id: int) -> bool:
                 "INSERT OR IGNORE INTO admins(chat_id, created_at) VALUES(?, ?)",
                 (chat_id, now_tz().isoformat()),
             )
+        invalidate_admin_cache()
         return True
     except Exception:
         return False
@@ -186,13 +426,39 @@ def add_admin_id(chat_id: int) -> bool:
 def remove_admin_id(chat_id: int) -> bool:
     with db() as conn:
         cur = conn.execute("DELETE FROM admins WHERE chat_id=?", (chat_id,))
-        return cur.rowcount > 0
+        removed = cur.rowcount > 0
+    if removed:
+        invalidate_admin_cache()
+    return removed
+
+
+# Settings change rarely (a handful of admin actions) but are read on every
+# add/renew/backup tick; serve them from this dict and write through it.
+_SETTINGS: dict = {}
 
 
 def get_setting(key: str, default: str) -> str:
+    if key in _SETTINGS:
+        return _SETTINGS[key]
     with db() as conn:
         row = conn.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
-        return row["value"] if row else default
+    if row is None:
+        return default
+    _SETTINGS[key] = row["value"]
+    return row["value"]
+
+
+def get_settings(*keys: str) -> dict:
+    """Fetch several settings in one query; missing keys are absent from the result."""
+    missing = [k for k in keys if k not in _SETTINGS]
+    if missing:
+        marks = ",".join("?" * len(missing))
+        with db() as conn:
+            rows = conn.execute(
+                f"SELECT key, value FROM settings WHERE key IN ({marks})", missing
+            ).fetchall()
+        _SETTINGS.update((r["key"], r["value"]) for r in rows)
+    return {k: _SETTINGS[k] for k in keys if k in _SETTINGS}
 
 
 def set_setting(key: str, value: str):
@@ -202,17 +468,59 @@ def set_setting(key: str, value: str):
             "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
             (key, value),
         )
+    _SETTINGS[key] = value
+
+
+def set_settings_bulk(pairs: List[tuple]):
+    """Upsert several settings in one transaction."""
+    with db() as conn:
+        conn.executemany(
+            "INSERT INTO settings(key, value) VALUES(?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            pairs,
+        )
+    _SETTINGS.update(pairs)
 
 
 def get_default_days() -> int:
-    try:
-        return int(get_setting("default_duration_days", str(DEFAULT_DURATION_DAYS)))
-    except Exception:
-        return DEFAULT_DURATION_DAYS
+    global _DEFAULT_DAYS_CACHE
+    if _DEFAULT_DAYS_CACHE is None:
+        try:
+            _DEFAULT_DAYS_CACHE = int(get_setting("default_duration_days", str(DEFAULT_DURATION_DAYS)))
+        except Exception:
+            _DEFAULT_DAYS_CACHE = DEFAULT_DURATION_DAYS
+    return _DEFAULT_DAYS_CACHE
 
 
 def set_default_days(n: int):
+    global _DEFAULT_DAYS_CACHE
     set_setting("default_duration_days", str(n))
+    _DEFAULT_DAYS_CACHE = n
+
+
+def renew_product(pid: int, extra_days: int) -> Optional[datetime]:
+    """Extend a product's expiry by extra_days.
+
+    Returns the new expiry, or None if no active product has that id. Select
+    and update share one transaction so both renew entry points (command and
+    inline button) pay a single round-trip. The date math stays in Python:
+    SQLite's datetime() would normalize the stored value to naive UTC and
+    drop the timezone offset we rely on elsewhere.
+    """
+    with db() as conn:
+        row = conn.execute(
+            "SELECT expires_at FROM products WHERE id=? AND is_active=1", (pid,)
+        ).fetchone()
+        if not row:
+            return None
+        base_expiry = datetime.fromisoformat(row["expires_at"]).astimezone(TZINFO)
+        new_expiry = base_expiry + timedelta(days=extra_days)
+        conn.execute(
+            "UPDATE products SET expires_at=?, duration_days=duration_days+?, updated_at=? "
+            "WHERE id=? AND is_active=1",
+            (to_utc_iso(new_expiry), extra_days, to_utc_iso(now_tz()), pid),
+        )
+    return new_expiry
 
 
 def is_backup_enabled() -> bool:
@@ -240,12 +548,24 @@ class Product:
     updated_at: str
 
 
+# The formats the bot itself suggests to users; tried with strptime before
+# paying for dateutil's guessing.
+_DATE_FASTPATHS = ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y")
+
+
 def parse_date(text: str) -> datetime:
     """Parse a date string like 2025-09-14 or natural text; returns timezone-aware midnight in DEFAULT_TZ."""
+    text = text.strip()
+    for fmt in _DATE_FASTPATHS:
+        try:
+            dt = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        return datetime(dt.year, dt.month, dt.day, tzinfo=TZINFO)
     dt = dateparser.parse(text, dayfirst=True, yearfirst=True)
     if not dt:
         raise ValueError("Cannot parse date. Use e.g. 2025-09-14 or 14/09/2025.")
-    local = datetime(dt.year, dt.month, dt.day, tzinfo=ZoneInfo(DEFAULT_TZ))
+    local = datetime(dt.year, dt.month, dt.day, tzinfo=TZINFO)
     return local
 
 
@@ -254,143 +574,268 @@ def compute_expiry(purchase_dt: datetime, days: Optional[int] = None) -> datetim
     return purchase_dt + timedelta(days=d)
 
 
+_SUMMARY_TMPL = (
+    "#%d — %s\n"
+    "خریدار/آیدی: %s\n"
+    "تاریخ خرید: %s | مدت: %d روز\n"
+    "تاریخ انقضا: %s | وضعیت: %s"
+)
+_STATUS_ACTIVE = f"{EMOJI_ACTIVE} فعال"
+_STATUS_INACTIVE = f"{EMOJI_CLOSE} غیرفعال"
+
+
+# rendered summaries, keyed by the fields that can change (expiry via renew,
+# status via close); a row's text is reused across pages and daily summaries
+_SUMMARY_CACHE: dict = {}
+_SUMMARY_CACHE_MAX = 1024
+
+
 def human_summary(row: sqlite3.Row) -> str:
-    status = f"{EMOJI_ACTIVE} فعال" if row["is_active"] else f"{EMOJI_CLOSE} غیرفعال"
-    exp = dateparser.isoparse(row["expires_at"]).astimezone(ZoneInfo(DEFAULT_TZ)).strftime("%Y-%m-%d")
-    return (
-        f"#{row['id']} — {row['description']}\n"
-        f"خریدار/آیدی: {row['buyer_id'] or '-'}\n"
-        f"تاریخ خرید: {row['purchase_date']} | مدت: {row['duration_days']} روز\n"
-        f"تاریخ انقضا: {exp} | وضعیت: {status}"
+    key = (row["id"], row["expires_at"], row["is_active"])
+    cached = _SUMMARY_CACHE.get(key)
+    if cached is not None:
+        return cached
+    status = _STATUS_ACTIVE if row["is_active"] else _STATUS_INACTIVE
+    exp = datetime.fromisoformat(row["expires_at"]).astimezone(TZINFO).strftime("%Y-%m-%d")
+    text = _SUMMARY_TMPL % (
+        row["id"], row["description"], row["buyer_id"] or "-",
+        row["purchase_date"], row["duration_days"], exp, status,
     )
+    if len(_SUMMARY_CACHE) >= _SUMMARY_CACHE_MAX:
+        _SUMMARY_CACHE.clear()
+    _SUMMARY_CACHE[key] = text
+    return text
 
 
 # ===================== Keyboards =====================
 def main_menu_kb() -> InlineKeyboardMarkup:
-    kb = [
-        [InlineKeyboardButton(f"{EMOJI_ADD} افزودن", callback_data="menu:add"),
-         InlineKeyboardButton(f"{EMOJI_MENU} فهرست", callback_data="menu:list")],
-        [InlineKeyboardButton(f"{EMOJI_EXPIRE} منقضی‌ها", callback_data="menu:expired"),
-         InlineKeyboardButton("📥 خروجی CSV", callback_data="menu:export")],
-        [InlineKeyboardButton("🧰 بکاپ‌گیری", callback_data="menu:backup")],
-        [InlineKeyboardButton(f"{EMOJI_ADMIN} مدیریت ادمین‌ها", callback_data="menu:admins")]
-    ]
-    return InlineKeyboardMarkup(kb)
+    return _MAIN_MENU_KB
 
 
 def admins_menu_kb() -> InlineKeyboardMarkup:
-    kb = [
-        [InlineKeyboardButton(f"{EMOJI_ADD} افزودن ادمین", callback_data="admins:add"),
-         InlineKeyboardButton(f"{EMOJI_REMOVE} حذف ادمین", callback_data="admins:remove")],
-        [InlineKeyboardButton("📜 لیست ادمین‌ها", callback_data="admins:list")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data="menu:home")]
-    ]
-    return InlineKeyboardMarkup(kb)
+    return _ADMINS_MENU_KB
 
 
 def backup_menu_kb() -> InlineKeyboardMarkup:
-    kb = [
-        [InlineKeyboardButton("📦 بکاپ الآن", callback_data="backup:now")],
-        [InlineKeyboardButton("⏱ هر 6 ساعت",  callback_data="backup:on:6"),
-         InlineKeyboardButton("⏱ هر 12 ساعت", callback_data="backup:on:12"),
-         InlineKeyboardButton("⏱ هر 24 ساعت", callback_data="backup:on:24")],
-        [InlineKeyboardButton("🛑 غیرفعال", callback_data="backup:off")],
-        [InlineKeyboardButton(f"{EMOJI_RESTORE} بازیابی بکاپ", callback_data="backup:restore")],
-        [InlineKeyboardButton("⬅️ بازگشت", callback_data="menu:home")]
-    ]
-    return InlineKeyboardMarkup(kb)
+    return _BACKUP_MENU_KB
+
+
+# The menus are static, and markup objects are immutable — build each exactly
+# once instead of re-allocating buttons on every interaction.
+_MAIN_MENU_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton(f"{EMOJI_ADD} افزودن", callback_data="menu:add"),
+     InlineKeyboardButton(f"{EMOJI_MENU} فهرست", callback_data="menu:list")],
+    [InlineKeyboardButton(f"{EMOJI_EXPIRE} منقضی‌ها", callback_data="menu:expired"),
+     InlineKeyboardButton("📥 خروجی CSV", callback_data="menu:export")],
+    [InlineKeyboardButton("🧰 بکاپ‌گیری", callback_data="menu:backup")],
+    [InlineKeyboardButton(f"{EMOJI_ADMIN} مدیریت ادمین‌ها", callback_data="menu:admins")]
+])
+
+_ADMINS_MENU_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton(f"{EMOJI_ADD} افزودن ادمین", callback_data="admins:add"),
+     InlineKeyboardButton(f"{EMOJI_REMOVE} حذف ادمین", callback_data="admins:remove")],
+    [InlineKeyboardButton("📜 لیست ادمین‌ها", callback_data="admins:list")],
+    [InlineKeyboardButton("⬅️ بازگشت", callback_data="menu:home")]
+])
+
+_BACKUP_MENU_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📦 بکاپ الآن", callback_data="backup:now")],
+    [InlineKeyboardButton("⏱ هر 6 ساعت",  callback_data="backup:on:6"),
+     InlineKeyboardButton("⏱ هر 12 ساعت", callback_data="backup:on:12"),
+     InlineKeyboardButton("⏱ هر 24 ساعت", callback_data="backup:on:24")],
+    [InlineKeyboardButton("🛑 غیرفعال", callback_data="backup:off")],
+    [InlineKeyboardButton(f"{EMOJI_RESTORE} بازیابی بکاپ", callback_data="backup:restore")],
+    [InlineKeyboardButton("⬅️ بازگشت", callback_data="menu:home")]
+])
+
+_SETDAYS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("30 روز", callback_data="setdays:30"),
+     InlineKeyboardButton("60 روز", callback_data="setdays:60"),
+     InlineKeyboardButton("90 روز", callback_data="setdays:90")]
+])
 
 
 # ===================== Auth =====================
 def is_admin(update: Update) -> bool:
     chat_id = update.effective_user.id if update.effective_user else None
-    admins = get_admin_ids()
-    if not admins:
+    if _ADMIN_SET is None and chat_id is not None and is_admin_id(chat_id):
+        # Cold cache: one indexed probe answers the common case without
+        # materializing the whole list.
+        return True
+    get_admin_ids()  # ensure the cache is populated
+    if not _ADMIN_SET:
         # Bootstrap: if no admins yet, allow private chat
         return update.effective_chat.type == "private"
-    return chat_id in admins
+    return chat_id in _ADMIN_SET
 
 
 async def guard_admin(update: Update) -> bool:
-    if not is_admin(update):
+    # is_admin can hit the DB on a cold cache; keep that off the loop
+    if not await asyncio.to_thread(is_admin, update):
         await update.effective_chat.send_message("دسترسی مجاز نیست.")
         return False
     return True
 
 
 # ===================== Backup helpers =====================
+ZIP_WRITE_BUFFER = 128 * 1024  # coalesce small DEFLATE outputs into large writes
+
+# Junk that bloats the archive (and trips MAX_BACKUP_MB) without being restorable data
+BACKUP_EXCLUDE_DIRS = {".git", "__pycache__", "venv", ".venv", "node_modules"}
+BACKUP_EXCLUDE_SUFFIXES = (".pyc", ".pyo")
+
+
 def make_backup_zip() -> Path:
+    """Build the backup ZIP. Blocking — call via run_in_executor from handlers."""
     ts = datetime.now().strftime("%Y%m%d-%H%M%S")
     src = Path(BACKUP_SRC).resolve()
-    out_dir = Path("/tmp")
-    out_base = out_dir / f"bot-backup-{ts}"
-    archive_path = shutil.make_archive(str(out_base), "zip", root_dir=str(src))
-    return Path(archive_path)
+    out_path = Path("/tmp") / f"bot-backup-{ts}.zip"
+
+    files = []
+    total_bytes = 0
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames[:] = [d for d in dirnames if d not in BACKUP_EXCLUDE_DIRS]
+        for fname in filenames:
+            if fname.endswith(BACKUP_EXCLUDE_SUFFIXES):
+                continue
+            fpath = Path(dirpath) / fname
+            try:
+                total_bytes += fpath.stat().st_size
+            except OSError:
+                continue
+            files.append(fpath)
+
+    # The payload is mostly SQLite pages that barely compress; when the tree
+    # already fits under the Telegram size cap, skip DEFLATE entirely and use
+    # the zip as a plain container. Bigger trees get the cheapest DEFLATE level.
+    if total_bytes < MAX_BACKUP_MB * 1024 * 1024 * 0.8:
+        compression, compresslevel = zipfile.ZIP_STORED, None
+    else:
+        compression, compresslevel = zipfile.ZIP_DEFLATED, 1
+
+    with open(out_path, "wb", buffering=ZIP_WRITE_BUFFER) as raw:
+        with zipfile.ZipFile(
+            raw, "w", compression, allowZip64=True, compresslevel=compresslevel
+        ) as zf:
+            for fpath in files:
+                zf.write(fpath, fpath.relative_to(src))
+    return out_path
 
 
 async def send_backup_to_admins(context: ContextTypes.DEFAULT_TYPE, caption: str = "📦 بکاپ"):
-    path = make_backup_zip()
+    path = await asyncio.get_running_loop().run_in_executor(None, make_backup_zip)
     size_mb = path.stat().st_size / (1024 * 1024)
-    admin_ids = get_admin_ids()
+    admin_ids = await asyncio.to_thread(get_admin_ids)
     if not admin_ids:
         return
 
     if size_mb > MAX_BACKUP_MB:
         msg = (f"⚠️ حجم بکاپ {size_mb:.1f}MB از حد مجاز ({MAX_BACKUP_MB}MB) بزرگ‌تر است.\n"
                f"مسیر فایل روی سرور: {path}")
-        for aid in admin_ids:
-            try:
-                await context.bot.send_message(chat_id=aid, text=msg)
-            except Exception:
-                pass
+        await asyncio.gather(
+            *(context.bot.send_message(chat_id=aid, text=msg) for aid in admin_ids),
+            return_exceptions=True,
+        )
         return
 
-    for aid in admin_ids:
+    # upload the bytes once; Telegram hands back a file_id that the
+    # remaining admins receive without re-uploading the archive. If the
+    # first upload fails (blocked chat, etc.) the next admin becomes the
+    # uploader — one broken chat must not kill delivery for everyone.
+    data = path.read_bytes()
+    file_id = None
+    rest = []
+    for idx, aid in enumerate(admin_ids):
         try:
-            with path.open("rb") as f:
-                await context.bot.send_document(chat_id=aid, document=f, filename=path.name, caption=caption)
-        except Exception:
-            pass
+            msg = await context.bot.send_document(
+                chat_id=aid, document=io.BytesIO(data), filename=path.name, caption=caption
+            )
+        except TelegramError as e:
+            logger.warning("backup upload to admin %s failed: %s", aid, e)
+            continue
+        file_id = msg.document.file_id
+        rest = admin_ids[idx + 1:]
+        break
+    if file_id is None or not rest:
+        return
+
+    async def _send(aid):
+        try:
+            await context.bot.send_document(chat_id=aid, document=file_id, caption=caption)
+        except TelegramError as e:
+            logger.warning("backup send to admin %s failed: %s", aid, e)
+
+    await asyncio.gather(*(_send(aid) for aid in rest))
+
+
+async def backup_job_callback(context: ContextTypes.DEFAULT_TYPE):
+    # read the interval at run time so a rescheduled job captions correctly
+    await send_backup_to_admins(
+        context, caption=f"📦 بکاپ خودکار (هر {get_backup_interval_hours()} ساعت)"
+    )
 
 
 def reschedule_backup_job(app: Application):
     """(Re)configure the repeating backup job based on settings."""
     if not app.job_queue:
-        print("JobQueue در دسترس نیست؛ زمان‌بندی بکاپ غیرفعال شد.")
+        logger.warning("JobQueue در دسترس نیست؛ زمان‌بندی بکاپ غیرفعال شد.")
         return
 
-    # remove old jobs
-    for job in app.job_queue.get_jobs_by_name("backup_job"):
-        job.schedule_removal()
+    existing = app.job_queue.get_jobs_by_name("backup_job")
 
-    if not is_backup_enabled():
-        print("Auto-backup disabled.")
+    settings = get_settings("backup_enabled", "backup_interval_hours")
+    if settings.get("backup_enabled", "0") != "1":
+        for job in existing:
+            job.schedule_removal()
+        logger.info("Auto-backup disabled.")
         return
 
-    hours = get_backup_interval_hours()
+    try:
+        hours = int(settings.get("backup_interval_hours", "24"))
+    except Exception:
+        hours = 24
     interval_seconds = max(1, hours) * 3600
-    first_run = datetime.now(ZoneInfo(DEFAULT_TZ)) + timedelta(minutes=5)
-
-    async def backup_job_callback(context: ContextTypes.DEFAULT_TYPE):
-        await send_backup_to_admins(context, caption=f"📦 بکاپ خودکار (هر {hours} ساعت)")
 
-    app.job_queue.run_repeating(
-        backup_job_callback,
-        interval=interval_seconds,
-        first=first_run,
-        name="backup_job",
-    )
-    print(f"Auto-backup enabled every {hours} hours.")
+    if existing:
+        # retrigger the job in place — one heap update instead of tearing the
+        # job down and re-adding it to the scheduler's store
+        existing[0].job.reschedule(
+            IntervalTrigger(seconds=interval_seconds, start_date=datetime.now(TZINFO) + timedelta(minutes=5))
+        )
+        for job in existing[1:]:
+            job.schedule_removal()
+    else:
+        app.job_queue.run_repeating(
+            backup_job_callback,
+            interval=interval_seconds,
+            first=datetime.now(TZINFO) + timedelta(minutes=5),
+            name="backup_job",
+        )
+    logger.info("Auto-backup enabled every %s hours.", hours)
 
 
 # ===================== Bot logic =====================
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not is_admin(update):
+    if not await asyncio.to_thread(is_admin, update):
         return
     await update.effective_chat.send_message("👋 سلام! از منوی زیر انتخاب کن:", reply_markup=main_menu_kb())
 
 
 # ---------- Add flow ----------
+def _insert_product(desc: str, purchase_date: str, duration: int, expires: datetime) -> int:
+    created = to_utc_iso(now_tz())
+    with db() as conn:
+        return conn.execute(
+            """
+            INSERT INTO products(description, buyer_id, purchase_date, duration_days, expires_at, is_active, created_at, updated_at)
+            VALUES(?, NULL, ?, ?, ?, 1, ?, ?)
+            RETURNING id
+            """,
+            (desc, purchase_date, duration, to_utc_iso(expires), created, created),
+        ).fetchone()["id"]
+
+
+
 async def add_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await guard_admin(update):
         return ConversationHandler.END
@@ -419,23 +864,10 @@ async def add_got_date(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return ConversationHandler.END
         pdate_local = parse_date(update.message.text.strip())
         expires = compute_expiry(pdate_local)
-        created = now_tz().isoformat()
-        with db() as conn:
-            conn.execute(
-                """
-                INSERT INTO products(description, buyer_id, purchase_date, duration_days, expires_at, is_active, created_at, updated_at)
-                VALUES(?, NULL, ?, ?, ?, 1, ?, ?)
-                """,
-                (
-                    desc,
-                    pdate_local.date().isoformat(),
-                    get_default_days(),
-                    expires.isoformat(),
-                    created,
-                    created,
-                ),
-            )
-            new_id = conn.execute("SELECT last_insert_rowid() AS id").fetchone()["id"]
+        duration = get_default_days()
+        new_id = await asyncio.to_thread(
+            _insert_product, desc, pdate_local.date().isoformat(), duration, expires
+        )
         kb = [[InlineKeyboardButton(f"{EMOJI_RENEW} تمدید دوباره", callback_data=f"renew:{new_id}")],
               [InlineKeyboardButton("⬅️ بازگشت به منو", callback_data="menu:home")]]
         await update.message.reply_text(
@@ -456,56 +888,113 @@ async def add_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # ---------- List / expired ----------
+PAGE_SIZE = 10
+
+
+def _fetch_rows(sql: str, params: tuple = ()):
+    with db() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+async def fetch_rows(sql: str, params: tuple = ()):
+    """Run a read query in a worker thread so a busy_timeout wait or a big
+    result set never stalls the update loop."""
+    return await asyncio.to_thread(_fetch_rows, sql, params)
+
+
+def build_product_page(rows, kind: str, page: int):
+    """One message per page of PAGE_SIZE products: summaries in the body,
+    a renew/close button pair per product, and a prev/next nav row."""
+    pages = max(1, -(-len(rows) // PAGE_SIZE))
+    page = max(0, min(page, pages - 1))
+    group = rows[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+    text = "\n\n".join(human_summary(r) for r in group)
+    kb = [
+        [
+            InlineKeyboardButton(f"{EMOJI_RENEW} #{r['id']}", callback_data=f"renew:{r['id']}"),
+            InlineKeyboardButton(f"{EMOJI_CLOSE} #{r['id']}", callback_data=f"finish:{r['id']}"),
+        ]
+        for r in group
+    ]
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("⬅️ قبلی", callback_data=f"pg:{kind}:{page - 1}"))
+    nav.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="menu:home"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("بعدی ➡️", callback_data=f"pg:{kind}:{page + 1}"))
+    kb.append(nav)
+    return text, InlineKeyboardMarkup(kb)
+
+
+async def _fetch_list_rows(kind: str):
+    if kind == "expired":
+        return await fetch_rows(SQL_LIST_EXPIRED, (to_utc_iso(now_tz()),))
+    return await fetch_rows(SQL_LIST_ACTIVE)
+
+
+async def on_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = await _answer_guarded(update)
+    if query is None:
+        return
+    _, kind, page_s = query.data.split(":")
+    rows = await _fetch_list_rows(kind)
+    if not rows:
+        await query.edit_message_text("مورد فعالی وجود ندارد.", reply_markup=main_menu_kb())
+        return
+    text, kb = build_product_page(rows, kind, int(page_s))
+    await query.edit_message_text(text, reply_markup=kb)
+
+
 async def list_active(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await guard_admin(update):
         return
-    with db() as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM products
-            WHERE is_active=1
-            ORDER BY datetime(expires_at) ASC
-            LIMIT 50
-            """
-        ).fetchall()
+    await _list_active(update, context)
+
+
+async def _list_active(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """list_active without the admin guard, for callers that already checked."""
+    rows = await _fetch_list_rows("list")
 
     if not rows:
         await update.effective_chat.send_message("مورد فعالی وجود ندارد.", reply_markup=main_menu_kb())
         return
 
-    for r in rows:
-        text = human_summary(r)
-        keyboard = [
-            [
-                InlineKeyboardButton(f"{EMOJI_RENEW} تمدید", callback_data=f"renew:{r['id']}"),
-                InlineKeyboardButton(f"{EMOJI_CLOSE} بستن", callback_data=f"finish:{r['id']}"),
-            ]
-        ]
-        await update.effective_chat.send_message(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    text, kb = build_product_page(rows, "list", 0)
+    await update.effective_chat.send_message(text, reply_markup=kb)
 
 
 async def list_expired(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await guard_admin(update):
         return
-    now = now_tz().isoformat()
-    with db() as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM products
-            WHERE is_active=1 AND datetime(expires_at) <= datetime(?)
-            ORDER BY datetime(expires_at) ASC
-            LIMIT 200
-            """,
-            (now,),
-        ).fetchall()
+    await _list_expired(update, context)
+
+
+async def _list_expired(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    rows = await _fetch_list_rows("expired")
     if not rows:
         await update.effective_chat.send_message("هیچ مورد منقضی‌شده‌ای نداریم.", reply_markup=main_menu_kb())
         return
-    for r in rows:
-        text = human_summary(r)
-        keyboard = [[InlineKeyboardButton(f"{EMOJI_RENEW} تمدید", callback_data=f"renew:{r['id']}"),
-                     InlineKeyboardButton(f"{EMOJI_CLOSE} بستن", callback_data=f"finish:{r['id']}")]]
-        await update.effective_chat.send_message(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    text, kb = build_product_page(rows, "expired", 0)
+    await update.effective_chat.send_message(text, reply_markup=kb)
+
+
+def _close_product(pid: int) -> bool:
+    """Deactivate one product; True if a live row was actually closed.
+
+    UPDATE ... RETURNING folds the write and the existence check into one
+    round-trip, and the is_active guard makes repeat taps no-ops instead
+    of redundant disk writes.
+    """
+    with db() as conn:
+        row = conn.execute(SQL_CLOSE, (to_utc_iso(now_tz()), pid)).fetchone()
+    return row is not None
+
+
+def _close_many(pids: List[int]) -> int:
+    """Bulk close: one prepared statement, one transaction, one fsync."""
+    now_iso = to_utc_iso(now_tz())
+    with db() as conn:
+        return conn.executemany(SQL_CLOSE_MANY, [(now_iso, pid) for pid in pids]).rowcount
 
 
 # ---------- Renew / finish (commands) ----------
@@ -522,17 +1011,10 @@ async def renew(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("شناسه یا روزها نامعتبر است.", reply_markup=main_menu_kb())
         return
 
-    with db() as conn:
-        row = conn.execute("SELECT * FROM products WHERE id=?", (pid,)).fetchone()
-        if not row:
-            await update.message.reply_text("یافت نشد.", reply_markup=main_menu_kb())
-            return
-        base_expiry = dateparser.isoparse(row["expires_at"]).astimezone(ZoneInfo(DEFAULT_TZ))
-        new_expiry = base_expiry + timedelta(days=extra_days)
-        conn.execute(
-            "UPDATE products SET expires_at=?, duration_days=duration_days+?, updated_at=? WHERE id=?",
-            (new_expiry.isoformat(), extra_days, now_tz().isoformat(), pid),
-        )
+    new_expiry = await asyncio.to_thread(renew_product, pid, extra_days)
+    if new_expiry is None:
+        await update.message.reply_text("یافت نشد.", reply_markup=main_menu_kb())
+        return
     await update.message.reply_text(f"{EMOJI_RENEW} تمدید شد. انقضای جدید: {new_expiry.strftime('%Y-%m-%d')}")
 
 
@@ -540,20 +1022,23 @@ async def finish(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await guard_admin(update):
         return
     if not context.args:
-        await update.message.reply_text("استفاده: /finish <id>", reply_markup=main_menu_kb())
+        await update.message.reply_text("استفاده: /finish <id> [id…]", reply_markup=main_menu_kb())
         return
     try:
-        pid = int(context.args[0])
+        pids = [int(a) for a in context.args]
     except Exception:
         await update.message.reply_text("شناسه نامعتبر است.", reply_markup=main_menu_kb())
         return
 
-    with db() as conn:
-        conn.execute(
-            "UPDATE products SET is_active=0, updated_at=? WHERE id=?",
-            (now_tz().isoformat(), pid),
-        )
-    await update.message.reply_text(f"{EMOJI_CLOSE} بسته شد.")
+    if len(pids) == 1:
+        if await asyncio.to_thread(_close_product, pids[0]):
+            await update.message.reply_text(f"{EMOJI_CLOSE} بسته شد.")
+        else:
+            await update.message.reply_text("یافت نشد یا قبلاً بسته شده.", reply_markup=main_menu_kb())
+        return
+
+    closed = await asyncio.to_thread(_close_many, pids)
+    await update.message.reply_text(f"{EMOJI_CLOSE} {closed} مورد از {len(pids)} بسته شد.")
 
 
 # ---------- Search ----------
@@ -564,17 +1049,16 @@ async def find(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not q:
         await update.message.reply_text("استفاده: /find <متن>", reply_markup=main_menu_kb())
         return
-    pattern = f"%{q}%"
-    with db() as conn:
-        rows = conn.execute(
-            """
-            SELECT * FROM products
-            WHERE description LIKE ? OR (buyer_id IS NOT NULL AND buyer_id LIKE ?)
-            ORDER BY datetime(expires_at) ASC
-            LIMIT 100
-            """,
-            (pattern, pattern),
-        ).fetchall()
+    # quote the query so user text is matched literally, not as FTS syntax
+    match = '"' + q.replace('"', '""') + '"'
+    try:
+        rows = await fetch_rows(SQL_FIND_FTS, (match,))
+    except sqlite3.OperationalError:
+        rows = []
+    if not rows:
+        # fall back to LIKE for mid-word substrings FTS tokens can't see
+        pattern = f"%{q}%"
+        rows = await fetch_rows(SQL_FIND, (pattern, pattern))
     if not rows:
         await update.message.reply_text("چیزی پیدا نشد.", reply_markup=main_menu_kb())
         return
@@ -586,10 +1070,7 @@ async def set_default(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await guard_admin(update):
         return
     if not context.args:
-        kb = [[InlineKeyboardButton("30 روز", callback_data="setdays:30"),
-               InlineKeyboardButton("60 روز", callback_data="setdays:60"),
-               InlineKeyboardButton("90 روز", callback_data="setdays:90")]]
-        await update.message.reply_text("مدت پیش‌فرض را انتخاب یا به‌صورت عددی بفرست:", reply_markup=InlineKeyboardMarkup(kb))
+        await update.message.reply_text("مدت پیش‌فرض را انتخاب یا به‌صورت عددی بفرست:", reply_markup=_SETDAYS_KB)
         return
     try:
         n = int(context.args[0])
@@ -598,7 +1079,7 @@ async def set_default(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception:
         await update.message.reply_text("عدد نامعتبر است.", reply_markup=main_menu_kb())
         return
-    set_default_days(n)
+    await asyncio.to_thread(set_default_days, n)
     await update.message.reply_text(f"مدت پیش‌فرض روی {n} روز تنظیم شد.")
 
 
@@ -606,40 +1087,79 @@ async def set_default(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def export_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await guard_admin(update):
         return
-    import csv
-    path = "export_products.csv"
-    with db() as conn, open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "id","description","buyer_id","purchase_date","duration_days",
-            "expires_at","is_active","created_at","updated_at",
-        ])
-        for r in conn.execute("SELECT * FROM products ORDER BY id ASC"):
-            writer.writerow([
-                r["id"], r["description"], r["buyer_id"], r["purchase_date"],
-                r["duration_days"], r["expires_at"], r["is_active"],
-                r["created_at"], r["updated_at"],
-            ])
-    await update.message.reply_document(InputFile(path))
+    await _export_csv(update, context)
+
+
+def _build_export_csv() -> tempfile.SpooledTemporaryFile:
+    # spooled: small exports stay in memory, big ones overflow to disk
+    # instead of holding the whole table as one Python string
+    buf = tempfile.SpooledTemporaryFile(max_size=8 << 20)
+    # utf-8-sig so Excel detects the encoding for the Persian descriptions
+    text = io.TextIOWrapper(buf, encoding="utf-8-sig", newline="", write_through=True)
+    writer = csv.writer(text)
+    writer.writerow([
+        "id","description","buyer_id","purchase_date","duration_days",
+        "expires_at","is_active","created_at","updated_at",
+    ])
+    with db() as conn:
+        # writerows consumes the cursor in C, one pass
+        writer.writerows(conn.execute(
+            "SELECT id, description, buyer_id, purchase_date, duration_days, "
+            "expires_at, is_active, created_at, updated_at "
+            "FROM products ORDER BY id ASC"
+        ))
+    text.flush()
+    text.detach()
+    buf.seek(0)
+    return buf
+
+
+async def _export_csv(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # build in a worker thread so a large table doesn't stall the update loop
+    buf = await asyncio.to_thread(_build_export_csv)
+    try:
+        await update.effective_chat.send_document(
+            InputFile(buf, filename="export_products.csv")
+        )
+    finally:
+        buf.close()
 
 
 # ---------- Admins: inline flows ----------
+# Users we are currently waiting on for an admin-id message. The dispatch
+# filter below checks this set so the text handler only ever runs for the
+# handful of updates that are actually part of an add/remove flow.
+_PENDING_ADMIN_INPUT: set = set()
+
+
+class _AwaitingAdminInputFilter(filters.MessageFilter):
+    def filter(self, message) -> bool:
+        return bool(message.from_user and message.from_user.id in _PENDING_ADMIN_INPUT)
+
+
+awaiting_admin_input_filter = _AwaitingAdminInputFilter(name="awaiting_admin_input")
+
+
 async def handle_admins_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, sub: str):
     if sub == "list":
-        ids = get_admin_ids()
+        ids = await asyncio.to_thread(get_admin_ids)
         if not ids:
             await update.effective_chat.send_message("ادمینی ثبت نشده.", reply_markup=admins_menu_kb())
             return
-        text = "👥 لیست ادمین‌ها:\n" + "\n".join(f"- `{cid}`" for cid in ids)
-        await update.effective_chat.send_message(text, reply_markup=admins_menu_kb(), parse_mode="Markdown")
+        # plain text: numeric ids gain nothing from backticks, and skipping
+        # parse_mode spares Telegram the server-side Markdown parse
+        text = "👥 لیست ادمین‌ها:\n" + "\n".join(f"- {cid}" for cid in ids)
+        await update.effective_chat.send_message(text, reply_markup=admins_menu_kb())
     elif sub == "add":
         context.user_data[AWAITING_ADMIN_ACTION_KEY] = "add"
+        _PENDING_ADMIN_INPUT.add(update.effective_user.id)
         await update.effective_chat.send_message(
             "آی‌دی عددی کاربر را بفرست تا به ادمین‌ها اضافه شود.",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ بازگشت", callback_data="menu:admins")]])
         )
     elif sub == "remove":
         context.user_data[AWAITING_ADMIN_ACTION_KEY] = "remove"
+        _PENDING_ADMIN_INPUT.add(update.effective_user.id)
         await update.effective_chat.send_message(
             "آی‌دی عددی ادمینی که می‌خواهی حذف شود را بفرست.",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("⬅️ بازگشت", callback_data="menu:admins")]])
@@ -659,18 +1179,19 @@ async def maybe_capture_admin_id_text(update: Update, context: ContextTypes.DEFA
         return True
     chat_id = int(text)
     if action == "add":
-        ok = add_admin_id(chat_id)
+        ok = await asyncio.to_thread(add_admin_id, chat_id)
         if ok:
             await update.message.reply_text(f"✅ ادمین با آی‌دی {chat_id} اضافه شد.", reply_markup=admins_menu_kb())
         else:
             await update.message.reply_text("خطا در افزودن ادمین.", reply_markup=admins_menu_kb())
     elif action == "remove":
-        ok = remove_admin_id(chat_id)
+        ok = await asyncio.to_thread(remove_admin_id, chat_id)
         if ok:
             await update.message.reply_text(f"✅ ادمین با آی‌دی {chat_id} حذف شد.", reply_markup=admins_menu_kb())
         else:
             await update.message.reply_text("چنین ادمینی یافت نشد.", reply_markup=admins_menu_kb())
     context.user_data.pop(AWAITING_ADMIN_ACTION_KEY, None)
+    _PENDING_ADMIN_INPUT.discard(update.effective_user.id)
     return True
 
 
@@ -740,12 +1261,26 @@ async def restore_got_zip(update: Update, context: ContextTypes.DEFAULT_TYPE):
             except Exception:
                 pass
 
-            # write new db
+            # write new db (close the shared connection first so WAL state
+            # doesn't point at the old file)
             data = zf.read(pick)
+            close_conn()
             Path(target_db_path).parent.mkdir(parents=True, exist_ok=True)
             with open(target_db_path, "wb") as out:
                 out.write(data)
 
+        # the restored file may predate the current schema (user_version,
+        # FTS table, UTC-Z timestamps the TEXT comparisons rely on) — run the
+        # migrations against it now instead of waiting for the next restart
+        await asyncio.to_thread(init_db)
+
+        # caches may describe the old database now
+        invalidate_admin_cache()
+        _SETTINGS.clear()
+        _SUMMARY_CACHE.clear()
+        global _DEFAULT_DAYS_CACHE
+        _DEFAULT_DAYS_CACHE = None
+
         await update.effective_chat.send_message("✅ دیتابیس بازیابی شد.", reply_markup=backup_menu_kb())
     except Exception as e:
         await update.effective_chat.send_message(f"❌ خطا در بازیابی: {e}", reply_markup=backup_menu_kb())
@@ -754,125 +1289,164 @@ async def restore_got_zip(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 # ---------- Inline buttons handler ----------
-async def on_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def _answer_guarded(update: Update):
+    """Common preamble for callback handlers: admin gate + ack the query.
+
+    Returns the CallbackQuery, or None when the presser is not an admin.
+    """
     if not await guard_admin(update):
-        return
+        return None
     query = update.callback_query
     await query.answer()
-    data = query.data
+    return query
 
-    # Menus
-    if data == "menu:home":
-        await query.edit_message_text("👋 سلام! از منوی زیر انتخاب کن:", reply_markup=main_menu_kb())
-        return
-    if data == "menu:list":
-        await list_active(update, context)
-        return
-    if data == "menu:expired":
-        await list_expired(update, context)
-        return
-    if data == "menu:export":
-        await export_csv(update, context)
+
+# menu:* routing tables: static edits keyed by subcommand, plus the three
+# entries that delegate to full handlers. Hash lookups instead of an if-chain.
+_MENU_EDITS = {
+    "home": ("👋 سلام! از منوی زیر انتخاب کن:", _MAIN_MENU_KB),
+    "admins": ("مدیریت ادمین‌ها:", _ADMINS_MENU_KB),
+    "backup": ("تنظیمات بکاپ‌گیری:", _BACKUP_MENU_KB),
+}
+
+
+async def on_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = await _answer_guarded(update)
+    if query is None:
         return
-    if data == "menu:admins":
-        await query.edit_message_text("مدیریت ادمین‌ها:", reply_markup=admins_menu_kb())
+    sub = query.data.split(":", 1)[1]
+    delegate = _MENU_DELEGATES.get(sub)
+    if delegate is not None:
+        await delegate(update, context)
         return
-    if data == "menu:backup":
-        await query.edit_message_text("تنظیمات بکاپ‌گیری:", reply_markup=backup_menu_kb())
+    text, kb = _MENU_EDITS.get(sub) or ("عملیات پشتیبانی نمی‌شود.", _MAIN_MENU_KB)
+    await query.edit_message_text(text, reply_markup=kb)
+
+
+_MENU_DELEGATES = {
+    "list": _list_active,
+    "expired": _list_expired,
+    "export": _export_csv,
+}
+
+
+async def on_admins(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = await _answer_guarded(update)
+    if query is None:
         return
+    sub = query.data.split(":", 1)[1]
+    await handle_admins_menu(update, context, sub)
+
 
-    # Admins submenu
-    if data.startswith("admins:"):
-        _, sub = data.split(":", 1)
-        await handle_admins_menu(update, context, sub)
+async def on_setdays(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = await _answer_guarded(update)
+    if query is None:
         return
+    try:
+        days = int(query.data.split(":", 1)[1])
+        await asyncio.to_thread(set_default_days, days)
+        await query.edit_message_text(f"مدت پیش‌فرض روی {days} روز تنظیم شد.", reply_markup=main_menu_kb())
+    except Exception:
+        await query.edit_message_text("خطای تنظیم مدت.", reply_markup=main_menu_kb())
 
-    # Settings quick set
-    if data.startswith("setdays:"):
-        _, n = data.split(":", 1)
+
+async def on_backup(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # backup:restore never reaches here: the restore conversation's entry
+    # point is registered first and claims it
+    query = await _answer_guarded(update)
+    if query is None:
+        return
+    parts = query.data.split(":")
+    if parts[1] == "now":
+        await query.edit_message_text("⏳ در حال ساخت بکاپ…")
+        await send_backup_to_admins(context, caption="📦 بکاپ دستی (الان)")
+        await query.edit_message_text("✅ بکاپ ساخته و ارسال شد.", reply_markup=backup_menu_kb())
+    elif parts[1] == "on" and len(parts) == 3:
         try:
-            days = int(n)
-            set_default_days(days)
-            await query.edit_message_text(f"مدت پیش‌فرض روی {days} روز تنظیم شد.", reply_markup=main_menu_kb())
+            hours = int(parts[2])
+            await asyncio.to_thread(
+                set_settings_bulk,
+                [("backup_enabled", "1"), ("backup_interval_hours", str(hours))],
+            )
+            reschedule_backup_job(context.application)
+            await query.edit_message_text(f"✅ بکاپ خودکار هر {hours} ساعت فعال شد.", reply_markup=backup_menu_kb())
         except Exception:
-            await query.edit_message_text("خطای تنظیم مدت.", reply_markup=main_menu_kb())
-        return
+            await query.edit_message_text("❗️ مقدار ساعت نامعتبر است.", reply_markup=backup_menu_kb())
+    elif parts[1] == "off":
+        await asyncio.to_thread(set_setting, "backup_enabled", "0")
+        reschedule_backup_job(context.application)
+        await query.edit_message_text("🛑 بکاپ خودکار غیرفعال شد.", reply_markup=backup_menu_kb())
+    else:
+        await query.edit_message_text("عملیات پشتیبانی نمی‌شود.", reply_markup=main_menu_kb())
 
-    # Backup actions (except restore which has its own conversation)
-    if data.startswith("backup:"):
-        parts = data.split(":")
-        if parts[1] == "now":
-            await query.edit_message_text("⏳ در حال ساخت بکاپ…")
-            await send_backup_to_admins(context, caption="📦 بکاپ دستی (الان)")
-            await query.edit_message_text("✅ بکاپ ساخته و ارسال شد.", reply_markup=backup_menu_kb())
-            return
-        if parts[1] == "on" and len(parts) == 3:
-            try:
-                hours = int(parts[2])
-                set_setting("backup_enabled", "1")
-                set_setting("backup_interval_hours", str(hours))
-                reschedule_backup_job(context.application)
-                await query.edit_message_text(f"✅ بکاپ خودکار هر {hours} ساعت فعال شد.", reply_markup=backup_menu_kb())
-            except Exception:
-                await query.edit_message_text("❗️ مقدار ساعت نامعتبر است.", reply_markup=backup_menu_kb())
-            return
-        if parts[1] == "off":
-            set_setting("backup_enabled", "0")
-            reschedule_backup_job(context.application)
-            await query.edit_message_text("🛑 بکاپ خودکار غیرفعال شد.", reply_markup=backup_menu_kb())
+
+async def on_product_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = await _answer_guarded(update)
+    if query is None:
+        return
+    action, pid_s = query.data.split(":", 1)
+    pid = int(pid_s)
+    if action == "renew":
+        new_expiry = await asyncio.to_thread(renew_product, pid, get_default_days())
+        if new_expiry is None:
+            await query.edit_message_text("یافت نشد.", reply_markup=main_menu_kb())
             return
+        await query.edit_message_text(
+            f"{EMOJI_RENEW} آیتم #{pid} تمدید شد.\nانقضای جدید: {new_expiry.strftime('%Y-%m-%d')}",
+            reply_markup=main_menu_kb()
+        )
+    else:  # finish
+        if await asyncio.to_thread(_close_product, pid):
+            await query.edit_message_text(f"{EMOJI_CLOSE} آیتم #{pid} بسته شد.", reply_markup=main_menu_kb())
+        else:
+            await query.edit_message_text("یافت نشد یا قبلاً بسته شده.", reply_markup=main_menu_kb())
 
-    # Product actions
-    if ":" in data:
-        action, pid_s = data.split(":", 1)
-        if action in {"renew", "finish"} and pid_s.isdigit():
-            pid = int(pid_s)
-            if action == "renew":
-                with db() as conn:
-                    row = conn.execute("SELECT * FROM products WHERE id=?", (pid,)).fetchone()
-                    if not row:
-                        await query.edit_message_text("یافت نشد.", reply_markup=main_menu_kb())
-                        return
-                    base_expiry = dateparser.isoparse(row["expires_at"]).astimezone(ZoneInfo(DEFAULT_TZ))
-                    days_to_add = get_default_days()
-                    new_expiry = base_expiry + timedelta(days=days_to_add)
-                    conn.execute(
-                        "UPDATE products SET expires_at=?, duration_days=duration_days+?, updated_at=? WHERE id=?",
-                        (new_expiry.isoformat(), days_to_add, now_tz().isoformat(), pid),
-                    )
-                await query.edit_message_text(
-                    f"{EMOJI_RENEW} آیتم #{pid} تمدید شد.\nانقضای جدید: {new_expiry.strftime('%Y-%m-%d')}",
-                    reply_markup=main_menu_kb()
-                )
-                return
-            elif action == "finish":
-                with db() as conn:
-                    conn.execute(
-                        "UPDATE products SET is_active=0, updated_at=? WHERE id=?",
-                        (now_tz().isoformat(), pid),
-                    )
-                await query.edit_message_text(f"{EMOJI_CLOSE} آیتم #{pid} بسته شد.", reply_markup=main_menu_kb())
-                return
 
+async def on_unknown_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = await _answer_guarded(update)
+    if query is None:
+        return
     await query.edit_message_text("عملیات پشتیبانی نمی‌شود.", reply_markup=main_menu_kb())
 
 
 # ---------- Daily summary job ----------
+async def broadcast_to_admins(context: ContextTypes.DEFAULT_TYPE, text: str):
+    """Send the same text to every admin concurrently (bounded under the
+    ~30 msg/s global Telegram limit)."""
+    admin_ids = await asyncio.to_thread(get_admin_ids)
+    if not admin_ids:
+        return
+    sem = asyncio.Semaphore(25)
+    # bind the invariant arguments once; per admin only chat_id varies
+    send = partial(context.bot.send_message, text=text)
+
+    async def _send(aid):
+        async with sem:
+            try:
+                await send(chat_id=aid)
+            except TelegramError as e:
+                logger.warning("broadcast to admin %s failed: %s", aid, e)
+
+    await asyncio.gather(*(_send(aid) for aid in admin_ids))
+
+
 async def daily_summary(context: ContextTypes.DEFAULT_TYPE):
-    admin_ids = get_admin_ids()
+    admin_ids = await asyncio.to_thread(get_admin_ids)
     if not admin_ids:
         return
     now = now_tz()
-    soon = now + timedelta(days=2)
-    with db() as conn:
-        exp = conn.execute(
-            "SELECT * FROM products WHERE is_active=1 AND datetime(expires_at) <= datetime(?) ORDER BY datetime(expires_at) ASC",
-            (now.isoformat(),),
-        ).fetchall()
-        upcoming = conn.execute(
-            "SELECT * FROM products WHERE is_active=1 AND datetime(expires_at) > datetime(?) AND datetime(expires_at) <= datetime(?) ORDER BY datetime(expires_at) ASC",
-            (now.isoformat(), soon.isoformat()),
-        ).fetchall()
+    now_iso = to_utc_iso(now)
+    soon_iso = to_utc_iso(now + timedelta(days=2))
+    # cheap single-row probe first: on the common "nothing to report" day
+    # we skip the full scan-and-format work entirely
+    probe = await fetch_rows(SQL_DAILY_PROBE, (soon_iso,))
+    if not probe[0][0]:
+        await broadcast_to_admins(context, f"امروز موردی برای پیگیری نیست {EMOJI_NONE}")
+        return
+    # one index range scan, bucketed into expired vs upcoming by the CASE column
+    rows = await fetch_rows(SQL_DAILY_SUMMARY, (now_iso, soon_iso))
+    exp = [r for r in rows if r["bucket"] == 0]
+    upcoming = [r for r in rows if r["bucket"] == 1]
 
     parts = []
     if exp:
@@ -883,27 +1457,77 @@ async def daily_summary(context: ContextTypes.DEFAULT_TYPE):
         parts.append(f"امروز موردی برای پیگیری نیست {EMOJI_NONE}")
     text = "\n\n".join(parts)
 
-    for aid in admin_ids:
-        try:
-            await context.bot.send_message(chat_id=aid, text=text)
-        except Exception:
-            pass
+    await broadcast_to_admins(context, text)
 
 
 # ===================== App wiring =====================
+COMMANDS = {
+    "start": start,
+    "list": list_active,
+    "expired": list_expired,
+    "renew": renew,
+    "finish": finish,
+    "find": find,
+    "setdefaultdays": set_default,
+    "export": export_csv,
+}
+
+
+async def dispatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # effective_message: the handler also sees edited messages, where
+    # update.message is None
+    msg = update.effective_message
+    if msg is None or not msg.text:
+        return
+    parts = msg.text.split()
+    name, _, mention = parts[0][1:].partition("@")
+    # CommandHandler only matches commands addressed to this bot; do the same
+    # so /list@SomeOtherBot in a group doesn't trigger us
+    if mention and mention.lower() != (context.bot.username or "").lower():
+        return
+    fn = COMMANDS.get(name.lower())
+    if fn is None:
+        return
+    # CommandHandler would normally populate args; do it ourselves
+    context.args = parts[1:]
+    await fn(update, context)
+
+
+
+async def on_shutdown(app: Application) -> None:
+    # refreshes planner stats via PRAGMA optimize, then closes cleanly
+    await asyncio.to_thread(close_conn)
+
+
+async def on_startup(app: Application) -> None:
+    # Schema creation/migrations run off the event loop, in parallel with
+    # PTB's own getMe bootstrap. Idempotent, so restarts are cheap.
+    await asyncio.to_thread(init_db)
+    # Needs the settings table, so it has to wait for init_db.
+    reschedule_backup_job(app)
+
+
 def build_app(token: str) -> Application:
-    init_db()
-    app = Application.builder().token(token).build()
-
-    # Commands
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("list", list_active))
-    app.add_handler(CommandHandler("expired", list_expired))
-    app.add_handler(CommandHandler("renew", renew))
-    app.add_handler(CommandHandler("finish", finish))
-    app.add_handler(CommandHandler("find", find))
-    app.add_handler(CommandHandler("setdefaultdays", set_default))
-    app.add_handler(CommandHandler("export", export_csv))
+    # one shared keep-alive httpx pool for the life of the process; sized so
+    # the gathered broadcast/list sends don't queue behind a tiny default pool
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(256)
+        .connection_pool_size(256)
+        .pool_timeout(20)
+        .connect_timeout(10)
+        .read_timeout(20)
+        .get_updates_connection_pool_size(1)
+        .get_updates_pool_timeout(40)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if importlib.util.find_spec("h2") is not None:
+        # multiplex the concurrent sends over one TLS connection; needs the
+        # optional httpx[http2] extra, so plain installs keep HTTP/1.1
+        builder = builder.http_version("2").get_updates_http_version("2")
+    app = builder.build()
 
     # Conversation: /add and inline menu:add
     conv_add = ConversationHandler(
@@ -918,6 +1542,8 @@ def build_app(token: str) -> Application:
         fallbacks=[CommandHandler("cancel", add_cancel)],
         name="add_conv",
         persistent=False,
+        # abandoned conversations drop out of the state map on their own
+        conversation_timeout=600,
     )
     app.add_handler(conv_add)
 
@@ -930,38 +1556,75 @@ def build_app(token: str) -> Application:
         fallbacks=[],
         name="restore_conv",
         persistent=False,
+        conversation_timeout=600,
     )
     app.add_handler(conv_restore)
 
-    # Capture admin add/remove numeric input (outside conversations)
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, lambda u, c: maybe_capture_admin_id_text(u, c)))
-
-    # Inline button handler (generic)
-    app.add_handler(CallbackQueryHandler(on_button))
+    # One dict-dispatched handler for the plain commands: an O(1) lookup
+    # instead of a linear scan over eight CommandHandlers per message.
+    # Registered after the conversations so /add and /cancel reach them first.
+    # UpdateType.MESSAGES keeps the CommandHandler scoping this replaces:
+    # plain and edited messages, never channel posts
+    app.add_handler(MessageHandler(
+        filters.COMMAND & filters.UpdateType.MESSAGES, dispatch_command
+    ))
+
+    # Capture admin add/remove numeric input (outside conversations). The
+    # pending-input filter fails fast for everyone else, so ordinary text
+    # messages never reach the handler coroutine.
+    app.add_handler(MessageHandler(
+        filters.TEXT & ~filters.COMMAND & awaiting_admin_input_filter,
+        maybe_capture_admin_id_text,
+    ))
+
+    # Inline buttons, routed by compiled pattern so each press touches only
+    # its own callback instead of walking one big if-ladder
+    app.add_handler(CallbackQueryHandler(on_menu, pattern=r"^menu:"))
+    app.add_handler(CallbackQueryHandler(on_admins, pattern=r"^admins:"))
+    app.add_handler(CallbackQueryHandler(on_setdays, pattern=r"^setdays:-?\d+$"))
+    app.add_handler(CallbackQueryHandler(on_backup, pattern=r"^backup:"))
+    app.add_handler(CallbackQueryHandler(on_page, pattern=r"^pg:(?:list|expired):\d+$"))
+    app.add_handler(CallbackQueryHandler(on_product_action, pattern=r"^(?:renew|finish):\d+$"))
+    app.add_handler(CallbackQueryHandler(on_unknown_button))
 
     # Daily summary at 09:00
     if app.job_queue:
-        tz = ZoneInfo(DEFAULT_TZ)
+        # static wall-clock time; APScheduler's cron trigger handles DST and
+        # the grace window lets a late start still fire today's summary
         app.job_queue.run_daily(
             daily_summary,
-            time=datetime.now(tz).replace(hour=9, minute=0, second=0, microsecond=0).timetz()
+            time=dtime(9, 0, tzinfo=TZINFO),
+            name="daily_summary",
+            job_kwargs={"misfire_grace_time": 3600, "coalesce": True},
         )
     else:
-        print("JobQueue در دسترس نیست؛ یادآوری روزانه غیرفعال شد.")
-
-    # Auto-backup schedule according to settings
-    reschedule_backup_job(app)
+        logger.warning("JobQueue در دسترس نیست؛ یادآوری روزانه غیرفعال شد.")
 
     return app
 
 
 def main():
+    # optional: uvloop roughly doubles asyncio network throughput when present
+    try:
+        import uvloop
+    except ImportError:
+        pass
+    else:
+        uvloop.install()
+    setup_logging()
     token = os.environ.get("BOT_TOKEN")
     if not token:
         raise SystemExit("Please set BOT_TOKEN env var.")
     app = build_app(token)
-    print("Bot is running… Press Ctrl+C to stop.")
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    logger.info("Bot is running… Press Ctrl+C to stop.")
+    # true long polling: the server holds the request up to 50s, so an idle
+    # bot makes ~1 request/min; retry bootstrap forever on flaky networks
+    app.run_polling(
+        allowed_updates=Update.ALL_TYPES,
+        poll_interval=0.0,
+        timeout=50,
+        bootstrap_retries=-1,
+    )
 
 
 if __name__ == "__main__":